@@ -11,11 +11,60 @@
 # 3. The number of the last page to extract
 
 import sys
+import io
+import itertools
 import os
+import pathlib
 import re
 import boto3
+from botocore.config import Config
+import shutil
 import subprocess
-import requests, uuid, json
+import threading
+import requests, json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+##-- Constants
+
+# set to True to print the intermediate results of the extraction
+DEBUG = False
+
+# seconds to wait for the server when downloading a ftpedia issue (to connect, then between two chunks)
+DOWNLOAD_TIMEOUT = 30
+
+# maximum number of texts and of characters sent to the translation service in one request
+MAX_REQUEST_TEXTS = 100
+MAX_REQUEST_CHARS = 45000
+
+# maximum number of requests sent in parallel to the translation service
+MAX_PARALLEL_REQUESTS = 8
+
+# a sequence of 3 spaces or more separates the left column from the right column
+GAP_RE = re.compile(r' {3,}')
+
+# a line that begins with at least 45 spaces belongs to the right column
+RIGHT_LINE_PREFIX = ' ' * 45
+
+# a tag of the LaTex template, e.g. <@titre@>
+TAG_RE = re.compile(r'<@\w+@>')
+
+# a line of the translated text that is the caption of a figure, with its newline (number and caption)
+# [^\S\n] is a whitespace that does not end the line
+FIGURE_LINE_RE = re.compile(r'^(?:Figure|Fig\.)[^\S\n]([0-9]+)[^\S\n]*:(.*)\n?', re.MULTILINE)
+
+# the name of the PDF file of a ftpedia issue (year and issue number)
+FTPEDIA_FILE_RE = re.compile(r'ftpedia-([0-9]{4})-([0-9])\.pdf')
+
+##-- Global variables
+
+# each thread that sends requests to the translation service keeps its own HTTP session
+http_sessions = threading.local()
+
+# client of the AWS Translate service, created by aws_translate_german_text on first use
+aws_translate_client = None
 
 ##-- Functions
 
@@ -27,14 +76,40 @@ def error_message(message):
 def info_message(message):
     print('\033[1;32m' + message + '\033[0m')
 
-# Function to translate the text content
+# Function to translate the text content (identical texts are only sent once)
+@lru_cache(maxsize=2048)
 def aws_translate_german_text(text):
+    global aws_translate_client
+    # create the AWS Translate client on first use, its connection pool is then reused by all the requests
+    if aws_translate_client is None:
+        config = Config(retries={'max_attempts': 10, 'mode': 'adaptive'}, max_pool_connections=16)
+        aws_translate_client = boto3.client(service_name='translate', region_name='eu-west-1', use_ssl=True, config=config)
     # send the text to the AWS Translate service
-    translate = boto3.client(service_name='translate', region_name='eu-west-1', use_ssl=True)
-    result = translate.translate_text(Text=text, SourceLanguageCode="de", TargetLanguageCode="fr")
+    result = aws_translate_client.translate_text(Text=text, SourceLanguageCode="de", TargetLanguageCode="fr")
     return result.get('TranslatedText')
 
-def azure_translate_german_text(endpoint, key, location, to_lang, text):
+# Function that converts pages of a PDF file to text preserving layout, or returns None if pdftotext fails
+# the text is written to the standard output by pdftotext and kept in memory
+def pdftotext_pages(pdf_file, first_page, last_page):
+    result = subprocess.run(['pdftotext', '-q', '-layout', '-f', str(first_page), '-l', str(last_page), pdf_file, '-'], capture_output=True)
+    if result.returncode != 0:
+        return None
+    return result.stdout.decode('utf-8')
+
+# Function that returns the HTTP session of the current thread, its connections are kept alive between requests
+def http_session():
+    if not hasattr(http_sessions, 'session'):
+        session = requests.Session()
+        # the requests rejected because of the rate limit or a server error are retried with a backoff
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504], allowed_methods=['POST'])
+        session.mount('https://', HTTPAdapter(max_retries=retry, pool_connections=8, pool_maxsize=16))
+        # the headers that do not depend on the request are set once on the session
+        session.headers.update({'Content-type': 'application/json'})
+        http_sessions.session = session
+    return http_sessions.session
+
+# Function to translate a list of texts with the Azure translation service in a single request
+def azure_translate_german_texts(endpoint, key, location, to_lang, texts):
     # parameters for the Azure translation service
     path = '/translate'
     constructed_url = endpoint + path
@@ -45,26 +120,117 @@ def azure_translate_german_text(endpoint, key, location, to_lang, text):
     }
     headers = {
         'Ocp-Apim-Subscription-Key': key,
-        'Ocp-Apim-Subscription-Region': location,
-        'Content-type': 'application/json',
-        'X-ClientTraceId': str(uuid.uuid4())
+        'Ocp-Apim-Subscription-Region': location
     }
-    body = [{
-        'text': text
-    }]
-    response = requests.post(constructed_url, params=params, headers=headers, json=body)
-    return response.json()[0]['translations'][0]['text']
-
-# Function to sanitize the spaces in a string
-def sanitize_spaces(s):
-    # replace sequences of 4 spaces or more by 3 spaces
-    # until there are no more sequences of 4 spaces or more
-    while s.find('    ') != -1:
-        s = s.replace('    ', '   ')
-    # replace all sequences of 3 spaces by a single space except the last sequence
-    while s.count('   ') > 1:
-        s = s.replace('   ', ' ', s.count('   ') - 1)
-    return s
+    body = [{'text': text} for text in texts]
+    response = http_session().post(constructed_url, params=params, headers=headers, json=body)
+    # an error response (e.g. a wrong key or region) holds an error object instead of the translations
+    response.raise_for_status()
+    # the translations are returned in the order of the texts
+    return [result['translations'][0]['text'] for result in response.json()]
+
+# Function that translates a list of texts, packed in as few requests as possible
+# it returns a dictionary that gives the translation of each text
+def azure_translate_all(endpoint, key, location, to_lang, texts):
+    # each distinct text is sent once (captions and headings repeat)
+    # empty texts are not sent, they would only add billed characters
+    unique = list(dict.fromkeys(text for text in texts if text))
+    batches = pack_texts(unique)
+    # the batches are translated in parallel, map() returns the results in the order of the batches
+    translations = {'': ''}
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_REQUESTS) as executor:
+        results = executor.map(lambda batch: azure_translate_german_texts(endpoint, key, location, to_lang, batch), batches)
+        translations.update(zip(unique, (translation for result in results for translation in result)))
+    return translations
+
+# Function that packs texts into batches small enough to be translated in one request
+def pack_texts(texts, max_texts=MAX_REQUEST_TEXTS, max_chars=MAX_REQUEST_CHARS):
+    batch = []
+    size = 0
+    for text in texts:
+        if batch and (len(batch) == max_texts or size + len(text) > max_chars):
+            yield batch
+            batch = []
+            size = 0
+        batch.append(text)
+        size += len(text)
+    if batch:
+        yield batch
+
+# Function that yields the lines of the text of the pages, the left column of a page before its right column
+def split_columns(pages):
+    for page in pages:
+        # the left column is produced line by line, the right column is kept until the end of the page
+        rightcolumn = []
+        # read the page line by line (the newline character is removed by strip())
+        for line in page:
+            # strip the line once, the tests below reuse the result
+            stripped = line.strip()
+            # if line begins with at least 45 spaces, it's a right line
+            if line.startswith(RIGHT_LINE_PREFIX):
+                rightline = stripped
+                leftline = ''
+            else:
+                # the last gap separates the columns, the other gaps are reduced to a single space
+                parts = GAP_RE.split(stripped)
+                if len(parts) == 1:
+                    leftline = stripped
+                    rightline = ''
+                else:
+                    leftline = ' '.join(parts[:-1])
+                    rightline = parts[-1]
+            yield leftline + '\n'
+            rightcolumn.append(rightline + '\n')
+        yield from rightcolumn
+
+# Function that yields the lines of a text, except a blank line that follows another blank line
+def remove_double_blank_lines(lines):
+    prevlineblank = False
+    for line in lines:
+        curlineblank = not line.strip()
+        # ignore two consecutive blank lines
+        if curlineblank and prevlineblank:
+            continue
+        prevlineblank = curlineblank
+        yield line
+
+# Function that reassembles the lines of a text into a list of paragraphs
+# (consecutive blank lines do not produce empty paragraphs, so the text needs no cleaning first)
+def reassemble_paragraphs(lines):
+    paragraphs = []
+    paragraph = []
+    for line in lines:
+        # strip the newline character
+        line = line.strip()
+        # an empty line ends the paragraph, if there is one
+        if not line:
+            if paragraph:
+                paragraphs.append(''.join(paragraph).strip())
+                paragraph = []
+        # if the last character of the line is a dash, remove the dash
+        elif line[-1] == '-':
+            paragraph.append(line[:-1])
+        else:
+            paragraph.append(line + ' ')
+    # do not lose the last paragraph if the text does not end with an empty line
+    if paragraph:
+        paragraphs.append(''.join(paragraph).strip())
+    return paragraphs
+
+# Function that returns the tex code of a figure with its image and its caption
+def latex_figure(numfig, caption):
+    return f'''
+\\begin{{minipage}}[h]{{7.5cm}}
+	\\centering
+    \\includegraphics[width=7.5cm]{{images/abb{numfig}.png}}
+    \\captionof{{figure}}{{{caption}}}
+    \\vspace{{0.6cm}}
+\\end{{minipage}}
+'''
+
+# Function that returns the stripped lines of the block that starts at line number start and ends before the first empty line
+def non_empty_lines(lines, start):
+    return list(itertools.takewhile(bool, (line.strip() for line in itertools.islice(lines, start, None))))
 
 # Function that puts the first letter of a string in uppercase
 def capitalize(s):
@@ -93,30 +259,43 @@ fpagenum = first_page
 lpagenum = last_page
 
 # check if the PDF filename has the good format for an ftpedia issue
-if not re.match(r'ftpedia-[0-9]{4}-[0-9].pdf', pdf_file):
+pdfmatch = FTPEDIA_FILE_RE.fullmatch(os.path.basename(pdf_file))
+if not pdfmatch:
     error_message('The PDF file is not a ftpedia issue.')
     sys.exit(1)
 
+# get the year and the issue number from the file name
+(year, issue) = pdfmatch.groups()
+
 # check if the PDF file exists
 if not os.path.exists(pdf_file):
     print('The PDF file does not exist.')
     # ask the user if he wants to download the file
     download = input('Do you want to download the file? [y/n] ')
     if download == 'y':
-        # get the year from the file name
-        year = re.search(r'ftpedia-([0-9]{4})-[0-9].pdf', pdf_file).group(1)
-        # get the issue number from the file name
-        issue = re.search(r'ftpedia-[0-9]{4}-([0-9]).pdf', pdf_file).group(1)
         # generate the url of the file
         urlftpedia = 'https://www.ftcommunity.de/ftpedia/{0}/{0}-{1}/ftpedia-{0}-{1}.pdf'.format(year, issue)
-        # download the file
-        os.system('wget {}'.format(urlftpedia))
-        # check if the download was successful
-        if os.path.exists(pdf_file):
-            print('The file has been downloaded successfully.')
-        else:
-            error_message('An error occurred while downloading the file.')
+        # download the file, it is written to disk in chunks of 1 MB as it arrives
+        # the chunks go to a temporary file that only gets the name of the PDF file once it is complete
+        partfile = pdf_file + '.part'
+        session = requests.Session()
+        # a request that fails because of the connection or a server error is retried with a backoff
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+        session.mount('https://', HTTPAdapter(max_retries=retry))
+        try:
+            with session.get(urlftpedia, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+                response.raise_for_status()
+                with open(partfile, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=1 << 20):
+                        f.write(chunk)
+            os.replace(partfile, pdf_file)
+        except (requests.RequestException, OSError) as e:
+            # do not leave a truncated PDF file behind
+            if os.path.exists(partfile):
+                os.remove(partfile)
+            error_message('An error occurred while downloading the file: {}'.format(e))
             sys.exit(1)
+        print('The file has been downloaded successfully.')
     else:
         error_message('The PDF file does not exist.')
         sys.exit(1)
@@ -132,20 +311,11 @@ if last_page < first_page:
 
 ##-- Check that the tools are installed
 
-# check if pdftk is installed
-if os.system('pdftk --version >/dev/null') != 0:
-    error_message('pdftk is not installed. Please install it before running this script.')
-    sys.exit(1)
-
-# check if pdftotext is installed
-if os.system('pdftotext -v >/dev/null') != 0:
-    error_message('pdftotext is not installed. Please install it before running this script.')
-    sys.exit(1) 
-
-# check if pdfimages is installed
-if os.system('pdfimages -v >/dev/null') != 0:
-    error_message('pdfimages is not installed. Please install it before running this script.')
-    sys.exit(1)
+# check if pdftotext and pdfimages are installed
+for tool in ['pdftotext', 'pdfimages']:
+    if shutil.which(tool) is None:
+        error_message('{} is not installed. Please install it before running this script.'.format(tool))
+        sys.exit(1)
 
 
 ##-- Extract the text content
@@ -153,203 +323,112 @@ if os.system('pdfimages -v >/dev/null') != 0:
 # Tell the user that the script is extracting the text content
 info_message('Extracting the text content...')
 
-# Using command pdftk to extract the specified pages
-os.system('pdftk {} cat {}-{} output temp.pdf'.format(pdf_file, first_page, last_page))
-#os.system('pdftotext temp.pdf')
+# Create a directory to store the images before pdfimages writes to it
+os.makedirs('images', exist_ok=True)
+
+# pdfimages only reads the PDF file, so the images are extracted in the background
+# while the text content is processed (see 'Extract the images' below)
+imgprocess = subprocess.Popen(['pdfimages', '-q', '-png', '-f', str(first_page), '-l', str(last_page), pdf_file, 'images/'])
 
 #-----------------------------------------------------------------------------------------#
-# use the command pdftotext on temp.pdf to convert pdf to text preservung layout
-os.system('pdftotext -q -layout temp.pdf temp1.txt')
+# use the command pdftotext to convert the pages of the article to text preservung layout
+# the pages are converted in parallel, one pdftotext process per page, map() keeps them in order
+with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+    pagetexts = list(executor.map(lambda page: pdftotext_pages(pdf_file, page, page), range(first_page, last_page + 1)))
+if None in pagetexts:
+    error_message('An error occurred while converting the pages to text with pdftotext.')
+    sys.exit(1)
+
+# all the extraction passes below work on the lines of the text of the article
+# (split on newlines only: the form feed that pdftotext puts before each page stays in the header line)
+lines = io.StringIO(''.join(pagetexts)).readlines()
 
 # extract the category of the article: it's the first non empty line after the header
-category = ''
-title = ''
-with open('temp1.txt', 'r') as f:
-    line = f.readline()
-    line = f.readline()
-    while not line.strip():
-        line = f.readline()
-    category = line.strip()
-    category = capitalize(category)
-    while line.strip():
-        line = f.readline()
-        title = title + line.strip() + ' '
+idx = 1
+while not lines[idx].strip():
+    idx += 1
+category = capitalize(lines[idx].strip())
+# the title is the block of lines following the category
+idx += 1
+titlelines = non_empty_lines(lines, idx)
+idx += len(titlelines)
+title = ' '.join(titlelines)
 print('CATEGORY: ' + category)
 print('TITLE: ' + title)
 
-# find the author of the article: it's the first non empty line after the second block of empty lines
-author = ''
-cptr = 0
-with open('temp1.txt', 'r') as f:
-    line = f.readline()
-    line = f.readline()
-    cptr = 2
-    while not line.strip():
-        line = f.readline()
-        cptr += 1
-    while line.strip():
-        line = f.readline()
-        cptr += 1
-    line = f.readline()
-    cptr += 1
-    author = line.strip()
+# find the author of the article: it's the line just after the empty line ending the title
+idx += 1
+author = lines[idx].strip()
 
 # find the abstract: it's the block of text after the author and before the first empty line
-# start is the line number of the beginning of the body of the article
-abstract = ''
-startbody = cptr
-with open('temp1.txt', 'r') as f:
-    for i in range(cptr):
-        line = f.readline()
-    line = f.readline()
-    startbody += 1
-    while not line.strip():
-        line = f.readline()
-        startbody += 1
-    while line.strip():
-        abstract = abstract + line.strip() + ' '
-        line = f.readline()
-        startbody += 1
-
-# find the line numbers of the lines with a page number
-pagenumbers = []
-with open('temp1.txt', 'r') as f:
-    for i, line in enumerate(f):
-        if line.strip().isdigit() and int(line.strip()) >= fpagenum and int(line.strip()) <= lpagenum:
-            pagenumbers.append(i + 1)
-print(pagenumbers)
-
-# put all the text of the article in a list of strings
-bodytext = []
-with open('temp1.txt', 'r') as f:
-    for i, line in enumerate(f):
-        if i >= startbody:
-            bodytext.append(line)
-
-# bodytextpages is a list of strings, each string is the text of a page
-bodytextpages = []
-cptr = 0
+idx += 1
+while not lines[idx].strip():
+    idx += 1
+abstractlines = non_empty_lines(lines, idx)
+idx += len(abstractlines)
+abstract = ' '.join(abstractlines)
+# startbody is the line number of the beginning of the body of the article
+startbody = idx + 1
+
+# find the line numbers of the lines with a page number (only shown to debug the extraction)
+if DEBUG:
+    pagenumbers = [i + 1 for i, stripped in enumerate(line.strip() for line in lines) if stripped.isdigit() and fpagenum <= int(stripped) <= lpagenum]
+    print(pagenumbers)
+
+# iterate over the lines of the body of the article, each page resumes where the previous one stopped
+bodytext = itertools.islice(lines, startbody, None)
+
+# bodytextpages is a list of lists of strings, each list holds the lines of a page
+bodytextpages = [[] for i in range(nbpages)]
 for i in range(nbpages):
-    bodytextpages.append('')
-    for line in bodytext[cptr:]:
-        cptr += 1
-        if line.strip().isdigit():
+    for line in bodytext:
+        stripped = line.strip()
+        if stripped.isdigit():
             break
         # let's ignore headers
-        if line.strip().startswith('ft:pedia') and line.strip().endswith(category):
+        if stripped.startswith('ft:pedia') and stripped.endswith(category):
             continue
-        if line.strip().startswith('Heft') and line.strip().endswith('ft:pedia'):
+        if stripped.startswith('Heft') and stripped.endswith('ft:pedia'):
             continue
-        bodytextpages[i] += line
-
-# loop over the pages and extract the text by columns
-newbody = ''
-cptr = 0
-for page in bodytextpages:
-    cptr += 1
-    leftcolumn = ''
-    rightcolumn = ''
-    # read the page line by line
-    for line in page.splitlines():
-        # if line begins with at least 45 spaces, it's a right line
-        if re.match(r'^\s{45,}', line):
-            rightline = line.strip()
-            leftline = ''
-        elif line.strip().find('   ') == -1:
-            leftline = line.strip()
-            rightline = ''
-        else:
-            if line.strip().count('   ') > 1:
-                (leftline,rightline) = sanitize_spaces(line).lstrip().split('   ', 1)
-            else:
-                (leftline,rightline) = line.lstrip().split('   ', 1)
-        leftcolumn += leftline + '\n'
-        rightcolumn += rightline.strip() + '\n'
-    newbody += leftcolumn
-    newbody += rightcolumn
+        bodytextpages[i].append(line)
 
-# print newbody to temp2.txt
-with open('temp2.txt', 'w') as f:
-    f.write(newbody)
+# extract the text of the pages by columns, the lines are produced as the next stages consume them
+newbody = split_columns(bodytextpages)
 
 #-----------------------------------------------------------------------------------------#
 
-# Cleaning the text file (specific to ftpedia PDFs)
-cleanedlines = []
-curlineblank = False
-prevlineblank = False
-with open('temp2.txt', 'r') as filesrc:
-    lines = filesrc.readlines()
-    for line in lines:
-        # if the current line is blanck, then set the variable curlineblank to True
-        if not line.strip():
-            curlineblank = True
-        else:
-            curlineblank = False
-        # ignore two consecutive blank lines
-        if curlineblank and prevlineblank:
-            prevlineblank = True
-            continue
-        prevlineblank = curlineblank
-        # if none of the previous conditions are met, then add the line to the list of cleaned lines
-        cleanedlines.append(line)
-
-# write the cleaned lines to the file temp2.txt
-with open('temp3.txt', 'w') as filedst:
-    filedst.writelines(cleanedlines)
-
-# Ask the user if he wants to edit the file temp4.txt to fix some issues in the text
+# Ask the user if he wants to edit the file temp3.txt to fix some issues in the text
+# the text only goes through the file temp3.txt when the user edits it
 openfile = input('Do you want to open the text to fix some issues? [y/n]')
 if openfile == 'y':
+    # Clean the text (specific to ftpedia PDFs) while writing it to the file temp3.txt
+    with open('temp3.txt', 'w') as filedst:
+        filedst.writelines(remove_double_blank_lines(newbody))
     return_code = subprocess.call(['xed', 'temp3.txt'])
-
-# Reassemble the sentences in the paragraphs
-with open('temp3.txt', 'r') as filesrc:
-    paragraph = ''
-    lines = filesrc.readlines()
-    for line in lines:
-        # strip the newline character
-        line = line.strip()
-        # if the line is empty, add an empty line to the file temp4.txt
-        if not line:
-            with open('temp4.txt', 'a') as filedst:
-                filedst.write(paragraph.strip() + '\n\n')
-                paragraph = ''
-            next
-        else:
-            # if the line is not empty, add the line to the paragraph
-            # if the last character of the line is a dash, remove the dash
-            if line[-1] == '-':
-                paragraph += line[:-1]
-            else:
-                paragraph += line + ' '
-            next
+    # Reassemble the sentences in the paragraphs, reading the edited file line by line
+    with open('temp3.txt', 'r') as filesrc:
+        paragraphs = reassemble_paragraphs(filesrc)
+else:
+    # Reassemble the sentences in the paragraphs, in the same pass that skips the double blank lines
+    paragraphs = reassemble_paragraphs(newbody)
 
 ##-- Extract the images
 
 # Tell the user that the script is extracting the images
 info_message('Extracting the images...')
 
-# Create a directory to store the images
-if not os.path.exists('images'):
-    os.makedirs('images')
-
-# Using command pdfimages to extract the images from the PDF file
-os.system('pdfimages -q -png -f {0} -l {1} {2} images/'.format(first_page, last_page, pdf_file))
+# Wait for the command pdfimages started before the text extraction to finish
+if imgprocess.wait() != 0:
+    error_message('An error occurred while extracting the images with pdfimages.')
+    sys.exit(1)
 
 # Rename the images
-files = os.listdir('images')
-for file in files:
-    # if the file is a PNG file, then
-    if file.endswith('.png'):
-        # get the number of the image
-        num = re.search(r'([0-9]+)', file).group(1).lstrip('0')
-        if num == '':
-            num = '0'
-        # increment the number of the image
-        num = str(int(num) + 1)
-        # rename the file
-        os.rename('images/' + file, 'images/abb' + num + '.png')
+# only the PNG files written by pdfimages are renamed, they are named -000.png, -001.png, ...
+imagesdir = pathlib.Path('images')
+for path in sorted(imagesdir.glob('-[0-9]*.png')):
+    # pdfimages numbers the images from 0, the figures are numbered from 1
+    num = int(path.stem.rsplit('-', 1)[1]) + 1
+    path.rename(imagesdir / 'abb{}.png'.format(num))
 
 
 ##-- Translate the text content
@@ -370,23 +449,15 @@ endpoint = 'https://api.cognitive.microsofttranslator.com/'
 location = 'westeurope'
 to_lang = 'fr'
 
-# send the lines to the AWS Translate service
-filepath = 'temp4.txt'
-translatedtext = ''
-with open(filepath) as fp:
-    line = fp.readline()
-    cnt = 1
-    while line :
-        linestripped = line
-        linestripped.strip()
-        result = azure_translate_german_text(endpoint, key, location, to_lang, linestripped)
-        translatedtext += result
-        line = fp.readline()
-        cnt += 1
-
-# Write the translated text to a file
-with open('temp5.txt', 'w') as f:
-    f.write(translatedtext)
+# send the category, the title, the abstract and the paragraphs to the Azure translation service together
+try:
+    translations = azure_translate_all(endpoint, key, location, to_lang, [category, title, abstract] + paragraphs)
+except requests.RequestException as e:
+    error_message('An error occurred while translating the text content: {}'.format(e))
+    sys.exit(1)
+
+# the translated paragraphs, separated by empty lines
+translatedtext = ''.join(translations[paragraph] + '\n\n' for paragraph in paragraphs if paragraph)
 
 ##-- Generate the LaTex file
 
@@ -405,16 +476,12 @@ tags = ['<@numero@>', '<@auteur@>', '<@categorie@>', '<@titre@>', '<@firstpagenu
 infos = ['123456', 'John Doe', 'Optique', 'Détecteur d\'ondes gravitationnelles', '666', 'Lorem ipsum dolor']
 
 # author's name to the user
-infos[0] = pdf_file.split('-')[2].split('.')[0] + '/' + pdf_file.split('-')[1]
+infos[0] = issue + '/' + year
 infos[1] = author
-infos[2] = category
-infos[3] = title
+infos[2] = capitalize(translations[category])
+infos[3] = translations[title]
 infos[4] = str(first_page)
-
-# translate the category and the title and the abstract
-infos[2] = capitalize(azure_translate_german_text(endpoint, key, location, to_lang, infos[2]))
-infos[3] = azure_translate_german_text(endpoint, key, location, to_lang, infos[3])
-infos[5] = azure_translate_german_text(endpoint, key, location, to_lang, abstract)
+infos[5] = translations[abstract]
 
 # # let's check the collected informations
 # for i, tag in enumerate(tags):
@@ -424,56 +491,19 @@ infos[5] = azure_translate_german_text(endpoint, key, location, to_lang, abstrac
 tplfilename = 'template.tex'
 
 # get filename without extension of the pdf file
-texfilename = pdf_file.split('.')[0] + '_FR.tex'
+# the LaTex file is written in the current directory, next to the images directory its figures refer to
+texfilename = os.path.splitext(os.path.basename(pdf_file))[0] + '_FR.tex'
 
-# create a copy of file 'template.tex', the name of the copy is 'filename.tex'
-os.system('cp template.tex ' + texfilename)
+# every tag of the template and the string that replaces it, the content being the translated text
+# in which the lines beginning with 'Figure' or 'Fig.' followed by a number are replaced by the tex code of a figure
+subs = dict(zip(tags, infos))
+subs['<@content@>'] = FIGURE_LINE_RE.sub(lambda match: latex_figure(match.group(1), match.group(2).strip()), translatedtext)
 
-# open the file 'filename.tex' in write mode
-lines = []
+# read the template and replace all the tags in memory, in a single pass
 with open(tplfilename, 'r') as file:
-    # read all lines of the file
-    lines = file.readlines()
-    # iterate over the list of tags
-    for i, tag in enumerate(tags):
-        # replace the string 'tag' by the string 'tag' + str(i)
-        lines = [line.replace(tag, infos[i]) for line in lines]
-
-# create the file texfilename with the modified lines
-with open(texfilename, 'w') as file:
-    file.writelines(lines)
-
-# read the content of the file 'temp5.txt' and replace the tag '<@content@>' in texfilename with this content
-with open('temp5.txt', 'r') as file:
-    content = file.read()
-    with open(texfilename, 'r') as file:
-        lines = file.readlines()
-        for i, line in enumerate(lines):
-            # if the line contains the tag '<@content@>', then
-            if '<@content@>' in line:
-                # replace the tag '<@content@>' by the content of the file 'temp5.txt'
-                lines[i] = line.replace('<@content@>', content)
-    with open(texfilename, 'w') as file:
-        file.writelines(lines)
-
-# define a heredoc string that is a tex template for a figure
-tplfig = '''
-\\begin{minipage}[h]{7.5cm}
-	\\centering
-    \\includegraphics[width=7.5cm]{images/abb<@numfig@>.png}
-    \\captionof{figure}{<@caption@>}
-    \\vspace{0.6cm}
-\\end{minipage}
-'''
+    text = file.read()
+text = TAG_RE.sub(lambda match: subs.get(match.group(0), match.group(0)), text)
 
-# in texfilename, replace the lines beginning with 'Figure' by the template tplfig
-with open(texfilename, 'r') as file:
-    lines = file.readlines()
-    for i, line in enumerate(lines):
-        # check if line is starting with 'Figure' or 'Fig.' followed by a number using regular expression
-        if re.match(r'^(Figure|Fig.)\s[0-9]+\s*:', line):
-            lines[i] = tplfig.replace('<@numfig@>', line.split(' ')[1].rstrip(':').rstrip())
-            lines[i] = lines[i].replace('<@caption@>', line.split(':')[1].strip())
-
-    with open(texfilename, 'w') as file:
-        file.writelines(lines)
+# write the LaTex file texfilename in one go
+with open(texfilename, 'w') as file:
+    file.write(text)